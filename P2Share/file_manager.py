@@ -6,9 +6,25 @@ Handles shared file management using only Python built-in libraries.
 
 import os
 import json
+import mmap
+import time
+import shutil
 import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+
+class _HashSink:
+    """File-like sink that feeds written data into a hash object"""
+
+    def __init__(self, hasher):
+        self.hasher = hasher
+
+    def write(self, data):
+        self.hasher.update(data)
+        return len(data)
+
 class FileManager:
     def __init__(self, config_dir=None):
         # Use user's home directory for config
@@ -19,110 +35,212 @@ class FileManager:
         self.config_dir.mkdir(exist_ok=True)
         
         self.shared_files_db = self.config_dir / 'shared_files.json'
+        self.shared_files_log = self.config_dir / 'shared_files.jsonl'
         self.downloads_dir = self.config_dir / 'downloads'
         self.downloads_dir.mkdir(exist_ok=True)
-        
+
+        # Guards shared_files and the mutation log: file adds run off
+        # the Tk thread while the UI iterates and removes entries
+        self._lock = threading.Lock()
+
         self.shared_files = self._load_shared_files()
+        # hash -> filename lookup table, rebuilt lazily after mutations
+        self._hash_index = None
+        # path -> (checked_at, exists), collapses repeated existence
+        # checks from back-to-back UI refreshes
+        self._existence_cache = {}
     
     def _load_shared_files(self):
-        """Load shared files database"""
-        if self.shared_files_db.exists():
+        """Load shared files database (snapshot plus mutation log)"""
+        files = {}
+        self._log_entries = 0
+
+        # json.loads on raw bytes skips the text-mode decode layer,
+        # which matters once the database holds thousands of entries
+        try:
+            files = json.loads(self.shared_files_db.read_bytes())
+        except (json.JSONDecodeError, IOError, OSError):
+            pass
+
+        try:
+            log_data = self.shared_files_log.read_bytes()
+        except (IOError, OSError):
+            log_data = b''
+
+        for line in log_data.splitlines():
+            if not line:
+                continue
             try:
-                with open(self.shared_files_db, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, IOError):
-                pass
-        return {}
-    
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Truncated tail from an interrupted append
+                continue
+            if record.get('op') == 'set':
+                files[record['name']] = record['info']
+            elif record.get('op') == 'del':
+                files.pop(record['name'], None)
+            self._log_entries += 1
+
+        return files
+
+    def _append_log(self, ops):
+        """Append mutation records to the on-disk log"""
+        if not ops:
+            return True
+        self._hash_index = None
+        try:
+            with open(self.shared_files_log, 'a', encoding='utf-8') as f:
+                f.write(''.join(
+                    json.dumps(record, separators=(',', ':')) + '\n'
+                    for record in ops))
+        except IOError:
+            return False
+
+        self._log_entries += len(ops)
+        if self._log_entries > max(64, 4 * len(self.shared_files)):
+            self._compact_log()
+        return True
+
+    def _compact_log(self):
+        """Fold the mutation log back into the snapshot file"""
+        if self._save_shared_files():
+            try:
+                self.shared_files_log.unlink()
+            except OSError:
+                # Replaying stale records over the snapshot is harmless,
+                # so a failed unlink only delays the next compaction
+                return
+            self._log_entries = 0
+
     def _save_shared_files(self):
-        """Save shared files database"""
+        """Save shared files database snapshot atomically"""
+        temp_path = self.shared_files_db.with_suffix('.json.tmp')
         try:
-            with open(self.shared_files_db, 'w', encoding='utf-8') as f:
-                json.dump(self.shared_files, f, indent=2)
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(self.shared_files, separators=(',', ':')))
+            # Rename so a crash mid-write never leaves a torn snapshot
+            os.replace(temp_path, self.shared_files_db)
             return True
-        except IOError:
+        except (IOError, OSError):
+            try:
+                temp_path.unlink()
+            except OSError:
+                pass
             return False
     
-    def add_shared_file(self, file_path):
+    def add_shared_file(self, file_path, file_hash=None):
         """Add a file to the shared files list"""
-        if not os.path.exists(file_path):
+        # One stat covers the existence check and the metadata below
+        try:
+            stat_result = os.stat(file_path)
+        except OSError:
             return False
-        
+
         filename = os.path.basename(file_path)
-        file_size = os.path.getsize(file_path)
-        file_hash = self._calculate_file_hash(file_path)
-        
+
+        # Re-adding an unchanged file is a no-op: the stat fingerprint
+        # proves the cached hash is still valid, so skip the full read
+        with self._lock:
+            existing = self.shared_files.get(filename)
+            if (file_hash is None and existing is not None and
+                    existing.get('path') == file_path and
+                    self._is_entry_current(existing, stat_result)):
+                return True
+
+        # Hash outside the lock: a multi-second read must not block the
+        # Tk thread's readers
+        if file_hash is None:
+            file_hash = self._calculate_file_hash(file_path)
+
         if not file_hash:
             return False
-        
-        # Check if file already exists
-        if filename in self.shared_files:
-            # Update if it's a different file
-            if self.shared_files[filename]['hash'] != file_hash:
-                self.shared_files[filename] = {
-                    'path': file_path,
-                    'size': file_size,
-                    'hash': file_hash,
-                    'added_time': self._get_current_time()
-                }
-        else:
-            self.shared_files[filename] = {
-                'path': file_path,
-                'size': file_size,
-                'hash': file_hash,
-                'added_time': self._get_current_time()
-            }
-        
-        return self._save_shared_files()
+
+        with self._lock:
+            # Check if file already exists (re-read: another add may
+            # have landed while we were hashing)
+            existing = self.shared_files.get(filename)
+            if existing is not None and existing['hash'] == file_hash:
+                return True
+            self.shared_files[filename] = self._make_file_entry(
+                file_path, file_hash, stat_result)
+
+            return self._append_log([
+                {'op': 'set', 'name': filename, 'info': self.shared_files[filename]}])
     
+    def _make_file_entry(self, file_path, file_hash, stat_result):
+        """Build a shared-file record including the stat fingerprint"""
+        return {
+            'path': file_path,
+            'size': stat_result.st_size,
+            'hash': file_hash,
+            'mtime_ns': stat_result.st_mtime_ns,
+            'inode': stat_result.st_ino,
+            'added_time': self._get_current_time()
+        }
+
+    def _is_entry_current(self, file_info, stat_result):
+        """Check whether a cached hash is still valid for the file on disk"""
+        return (file_info.get('hash') is not None and
+                file_info.get('size') == stat_result.st_size and
+                file_info.get('mtime_ns') == stat_result.st_mtime_ns and
+                file_info.get('inode') == stat_result.st_ino)
+
     def remove_shared_file(self, filename):
         """Remove a file from the shared files list"""
-        if filename in self.shared_files:
-            del self.shared_files[filename]
-            return self._save_shared_files()
-        return False
-    
+        with self._lock:
+            if filename in self.shared_files:
+                del self.shared_files[filename]
+                return self._append_log([{'op': 'del', 'name': filename}])
+            return False
+
     def get_shared_files(self):
         """Get list of shared file names"""
-        # Clean up non-existent files
-        files_to_remove = []
-        for filename, file_info in self.shared_files.items():
-            if not os.path.exists(file_info['path']):
-                files_to_remove.append(filename)
-        
-        for filename in files_to_remove:
-            del self.shared_files[filename]
-        
-        if files_to_remove:
-            self._save_shared_files()
-        
-        return list(self.shared_files.keys())
-    
+        with self._lock:
+            # Clean up non-existent files
+            files_to_remove = []
+            for filename, file_info in self.shared_files.items():
+                if not self._path_exists(file_info['path']):
+                    files_to_remove.append(filename)
+
+            for filename in files_to_remove:
+                del self.shared_files[filename]
+
+            self._append_log([{'op': 'del', 'name': filename}
+                              for filename in files_to_remove])
+
+            return list(self.shared_files.keys())
+
     def get_file_path(self, filename):
         """Get the full path of a shared file"""
-        if filename in self.shared_files:
-            return self.shared_files[filename]['path']
-        return None
-    
+        with self._lock:
+            if filename in self.shared_files:
+                return self.shared_files[filename]['path']
+            return None
+
     def get_file_info(self, filename):
         """Get detailed information about a shared file"""
-        if filename in self.shared_files:
-            file_info = self.shared_files[filename].copy()
-            if os.path.exists(file_info['path']):
-                # Update size in case file was modified
-                current_size = os.path.getsize(file_info['path'])
-                if current_size != file_info['size']:
-                    file_info['size'] = current_size
-                    file_info['hash'] = self._calculate_file_hash(file_info['path'])
-                    # Update in database
-                    self.shared_files[filename].update({
-                        'size': current_size,
-                        'hash': file_info['hash']
-                    })
-                    self._save_shared_files()
-                
-                return file_info
-        return None
+        with self._lock:
+            if filename not in self.shared_files:
+                return None
+            stored_info = self.shared_files[filename]
+            try:
+                stat_result = os.stat(stored_info['path'])
+            except OSError:
+                return None
+
+            # Re-hash only when the file on disk no longer matches the record
+            if not self._is_entry_current(stored_info, stat_result):
+                stored_info.update({
+                    'size': stat_result.st_size,
+                    'hash': self._calculate_file_hash(stored_info['path']),
+                    'mtime_ns': stat_result.st_mtime_ns,
+                    'inode': stat_result.st_ino
+                })
+                self._append_log([{'op': 'set', 'name': filename, 'info': stored_info}])
+
+            # Hand back the stored record itself; callers only read it,
+            # and copying per lookup just feeds the garbage collector
+            return stored_info
     
     def get_downloads_directory(self):
         """Get the downloads directory path"""
@@ -130,72 +248,135 @@ class FileManager:
     
     def is_file_shared(self, filename):
         """Check if a file is currently shared"""
-        return filename in self.shared_files
-    
+        with self._lock:
+            return filename in self.shared_files
+
     def get_shared_files_summary(self):
         """Get summary of all shared files"""
-        summary = {
-            'total_files': len(self.shared_files),
-            'total_size': 0,
-            'files': []
-        }
-        
-        for filename, file_info in self.shared_files.items():
-            if os.path.exists(file_info['path']):
-                summary['total_size'] += file_info['size']
-                summary['files'].append({
-                    'name': filename,
-                    'size': file_info['size'],
-                    'hash': file_info['hash'],
-                    'path': file_info['path']
-                })
-        
-        return summary
-    
+        with self._lock:
+            summary = {
+                'total_files': len(self.shared_files),
+                'total_size': 0,
+                'files': []
+            }
+
+            for filename, file_info in self.shared_files.items():
+                if self._path_exists(file_info['path']):
+                    summary['total_size'] += file_info['size']
+                    summary['files'].append({
+                        'name': filename,
+                        'size': file_info['size'],
+                        'hash': file_info['hash'],
+                        'path': file_info['path']
+                    })
+
+            return summary
+
     def validate_shared_files(self):
         """Validate all shared files and remove invalid ones"""
         invalid_files = []
-        
-        for filename, file_info in self.shared_files.items():
-            file_path = file_info['path']
-            
-            # Check if file exists
-            if not os.path.exists(file_path):
-                invalid_files.append(filename)
-                continue
-            
-            # Check if file hash matches (optional integrity check)
-            if file_info.get('hash'):
-                current_hash = self._calculate_file_hash(file_path)
+        files_to_check = []
+
+        with self._lock:
+            for filename, file_info in self.shared_files.items():
+                file_path = file_info['path']
+
+                # Check if file exists
+                try:
+                    stat_result = os.stat(file_path)
+                except OSError:
+                    invalid_files.append(filename)
+                    continue
+
+                # Re-hash only files whose stat fingerprint changed
+                if file_info.get('hash') and not self._is_entry_current(file_info, stat_result):
+                    files_to_check.append((filename, file_path, stat_result))
+
+        # Hash with the lock dropped, then re-check each entry under it:
+        # files may have been added or removed while we were reading
+        hashes = self._hash_files([path for _, path, _ in files_to_check])
+
+        with self._lock:
+            ops = []
+            for filename, file_path, stat_result in files_to_check:
+                file_info = self.shared_files.get(filename)
+                if file_info is None or file_info['path'] != file_path:
+                    continue
+                current_hash = hashes.get(file_path)
                 if current_hash != file_info['hash']:
                     # File was modified, update hash
                     file_info['hash'] = current_hash
-                    file_info['size'] = os.path.getsize(file_path)
-        
-        # Remove invalid files
-        for filename in invalid_files:
-            del self.shared_files[filename]
-        
-        if invalid_files:
-            self._save_shared_files()
-        
+                    file_info['size'] = stat_result.st_size
+                file_info['mtime_ns'] = stat_result.st_mtime_ns
+                file_info['inode'] = stat_result.st_ino
+                ops.append({'op': 'set', 'name': filename, 'info': file_info})
+
+            # Remove invalid files
+            for filename in invalid_files:
+                if self.shared_files.pop(filename, None) is not None:
+                    ops.append({'op': 'del', 'name': filename})
+
+            self._append_log(ops)
+
         return invalid_files
     
+    # Files at least this large are hashed through mmap; below it the
+    # mapping setup overhead outweighs the savings
+    MMAP_HASH_THRESHOLD = 10 * 1024 * 1024
+
+    # How long a cached existence check stays valid, in seconds
+    EXISTENCE_CACHE_TTL = 2.0
+
+    def _path_exists(self, path):
+        """Existence check memoized for a short window"""
+        now = time.time()
+        cached = self._existence_cache.get(path)
+        if cached is not None and now - cached[0] < self.EXISTENCE_CACHE_TTL:
+            return cached[1]
+
+        exists = os.path.exists(path)
+        self._existence_cache[path] = (now, exists)
+        return exists
+
+    def _hash_files(self, file_paths):
+        """Hash several files concurrently, returning {path: hash}"""
+        if not file_paths:
+            return {}
+        if len(file_paths) == 1:
+            return {file_paths[0]: self._calculate_file_hash(file_paths[0])}
+
+        # hashlib releases the GIL during update(), so worker threads
+        # overlap hashing with disk reads of the other files
+        workers = min(8, os.cpu_count() or 1, len(file_paths))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return dict(zip(file_paths, executor.map(self._calculate_file_hash, file_paths)))
+
     def _calculate_file_hash(self, file_path):
         """Calculate SHA-256 hash of a file"""
         try:
             hash_sha256 = hashlib.sha256()
-            with open(file_path, 'rb') as f:
-                # Read file in chunks to handle large files
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hash_sha256.update(chunk)
+            with open(file_path, 'rb', buffering=0) as f:
+                file_size = os.fstat(f.fileno()).st_size
+                if file_size >= self.MMAP_HASH_THRESHOLD:
+                    # Feed the page cache straight to the hash routine,
+                    # skipping the intermediate read buffers entirely
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        if hasattr(mm, 'madvise'):
+                            mm.madvise(mmap.MADV_SEQUENTIAL)
+                        hash_sha256.update(mm)
+                elif hasattr(hashlib, 'file_digest'):
+                    # Python 3.11+: the whole read+hash loop runs in C
+                    hash_sha256 = hashlib.file_digest(f, 'sha256')
+                else:
+                    # Pre-3.11 fallback: copyfileobj runs the read loop in
+                    # C with 1 MiB chunks, pumping into the hash sink
+                    shutil.copyfileobj(f, _HashSink(hash_sha256), length=1024 * 1024)
             return hash_sha256.hexdigest()
-        except (IOError, OSError):
+        except (IOError, OSError, ValueError):
             return None
     
     def _get_current_time(self):
         """Get current timestamp"""
-        import time
         return int(time.time())
     
     def export_shared_files_list(self, output_file=None):
@@ -219,10 +400,12 @@ class FileManager:
             
             if 'files' in data:
                 imported_count = 0
-                for file_info in data['files']:
-                    if 'path' in file_info and os.path.exists(file_info['path']):
-                        if self.add_shared_file(file_info['path']):
-                            imported_count += 1
+                paths = [file_info['path'] for file_info in data['files']
+                         if 'path' in file_info and os.path.exists(file_info['path'])]
+                hashes = self._hash_files(paths)
+                for path in paths:
+                    if self.add_shared_file(path, file_hash=hashes.get(path)):
+                        imported_count += 1
                 return imported_count
         except (IOError, json.JSONDecodeError):
             pass
@@ -231,30 +414,37 @@ class FileManager:
     
     def get_file_by_hash(self, file_hash):
         """Find a shared file by its hash"""
-        for filename, file_info in self.shared_files.items():
-            if file_info.get('hash') == file_hash:
-                return filename, file_info
-        return None, None
+        with self._lock:
+            if self._hash_index is None:
+                self._hash_index = {file_info['hash']: filename
+                                    for filename, file_info in self.shared_files.items()
+                                    if file_info.get('hash')}
+
+            filename = self._hash_index.get(file_hash)
+            if filename is not None:
+                return filename, self.shared_files[filename]
+            return None, None
     
     def cleanup_downloads(self, max_age_days=30):
         """Clean up old downloaded files"""
-        import time
-        
         current_time = time.time()
         max_age_seconds = max_age_days * 24 * 60 * 60
         
         cleaned_files = []
         
         try:
-            for file_path in self.downloads_dir.iterdir():
-                if file_path.is_file():
-                    file_age = current_time - file_path.stat().st_mtime
-                    if file_age > max_age_seconds:
-                        try:
-                            file_path.unlink()
-                            cleaned_files.append(str(file_path))
-                        except OSError:
-                            pass
+            # scandir serves is_file/stat from the directory read itself,
+            # avoiding extra syscalls per entry
+            with os.scandir(self.downloads_dir) as entries:
+                for entry in entries:
+                    if entry.is_file(follow_symlinks=False):
+                        file_age = current_time - entry.stat().st_mtime
+                        if file_age > max_age_seconds:
+                            try:
+                                os.unlink(entry.path)
+                                cleaned_files.append(entry.path)
+                            except OSError:
+                                pass
         except OSError:
             pass
         
@@ -6,6 +6,8 @@ A peer-to-peer file sharing system using Bluetooth with pybluez.
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
+import os
+import queue
 import threading
 import json
 import time
@@ -28,9 +30,15 @@ class BluetoothP2PFileShareApp:
         # UI Variables
         self.status_var = tk.StringVar(value="Offline")
         self.bt_info_var = tk.StringVar(value="Bluetooth: Not detected")
-        
+
+        # Log entries are queued (network callbacks run off-thread) and
+        # flushed into the text widget in batches
+        self._log_queue = queue.Queue()
+
         self.setup_ui()
         self.setup_callbacks()
+
+        self.root.after(100, self._flush_log)
         
         # Check Bluetooth and start discovery
         self.check_bluetooth_adapter()
@@ -207,13 +215,21 @@ class BluetoothP2PFileShareApp:
             filetypes=[("All Files", "*.*")]
         )
         
-        if file_path:
+        if not file_path:
+            return
+
+        filename = os.path.basename(file_path)
+        self.log_message(f"Adding file: {filename}")
+
+        # Hashing a large file takes seconds, so keep it off the Tk thread
+        def add_thread():
             if self.file_manager.add_shared_file(file_path):
-                self.update_files_list()
-                filename = file_path.split('/')[-1].split('\\')[-1]  # Cross-platform basename
-                self.log_message(f"Added file: {filename}")
+                self.root.after(0, self.update_files_list)
+                self.root.after(0, lambda: self.log_message(f"Added file: {filename}"))
             else:
-                messagebox.showerror("Error", "Failed to add file")
+                self.root.after(0, lambda: messagebox.showerror("Error", "Failed to add file"))
+
+        threading.Thread(target=add_thread, daemon=True).start()
     
     def remove_file(self):
         """Remove a shared file"""
@@ -227,7 +243,6 @@ class BluetoothP2PFileShareApp:
     def open_downloads(self):
         """Open downloads directory"""
         import subprocess
-        import os
         download_dir = self.file_manager.get_downloads_directory()
         
         try:
@@ -347,15 +362,18 @@ class BluetoothP2PFileShareApp:
     def update_files_list(self):
         """Update the files listbox"""
         self.my_files_listbox.delete(0, tk.END)
-        for filename in self.file_manager.get_shared_files():
-            self.my_files_listbox.insert(tk.END, filename)
-    
+        files = self.file_manager.get_shared_files()
+        if files:
+            # One insert call crosses into Tcl once instead of per item
+            self.my_files_listbox.insert(tk.END, *files)
+
     def update_peers_list(self):
         """Update the peers listbox"""
         self.peers_listbox.delete(0, tk.END)
-        for peer in self.peer_discovery.get_peers():
-            display_text = f"{peer['name']} ({peer['address']})"
-            self.peers_listbox.insert(tk.END, display_text)
+        items = tuple(f"{peer['name']} ({peer['address']})"
+                      for peer in self.peer_discovery.get_peers())
+        if items:
+            self.peers_listbox.insert(tk.END, *items)
     
     def clear_log(self):
         """Clear the activity log"""
@@ -386,9 +404,32 @@ class BluetoothP2PFileShareApp:
     def log_message(self, message):
         """Add message to log"""
         timestamp = time.strftime("%H:%M:%S")
-        log_entry = f"[{timestamp}] {message}\n"
-        self.log_text.insert(tk.END, log_entry)
-        self.log_text.see(tk.END)
+        self._log_queue.put(f"[{timestamp}] {message}\n")
+
+    def _flush_log(self):
+        """Flush queued log entries into the widget in a single insert"""
+        entries = []
+        while True:
+            try:
+                entries.append(self._log_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        if entries:
+            self.log_text.insert(tk.END, ''.join(entries))
+            self._trim_log()
+            self.log_text.see(tk.END)
+
+        self.root.after(100, self._flush_log)
+
+    # Oldest log lines are dropped once the widget grows past this
+    MAX_LOG_LINES = 5000
+
+    def _trim_log(self):
+        """Keep the log widget bounded to a rolling window of lines"""
+        line_count = int(self.log_text.index('end-1c').split('.')[0])
+        if line_count > self.MAX_LOG_LINES:
+            self.log_text.delete('1.0', f'{line_count - self.MAX_LOG_LINES + 1}.0')
     
     def on_closing(self):
         """Handle application closing"""
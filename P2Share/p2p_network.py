@@ -5,6 +5,11 @@ Handles Bluetooth socket communication between peers using pybluez.
 """
 
 import bluetooth
+import queue
+import selectors
+import socket
+import struct
+import sys
 import threading
 import json
 import os
@@ -12,14 +17,100 @@ import hashlib
 import time
 from file_manager import FileManager
 
+# orjson encodes/decodes straight to bytes in C; fall back to stdlib json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+else:
+    def _json_dumps(message):
+        return json.dumps(message).encode('utf-8')
+    _json_loads = json.loads
+
+
+SERVICE_UUID = "94f39d29-7d6d-437d-973b-fba39e49d4ee"
+SERVICE_NAME = "P2P File Share"
+
+# Compiled once: the 4-byte big-endian length prefix used on the wire
+_LEN_PREFIX = struct.Struct('>I')
+
+# Send/receive buffer size for RFCOMM sockets; overridable so
+# deployments can tune the in-flight window for their links
+SOCKET_BUFFER_SIZE = int(os.environ.get('P2SHARE_SOCKBUF', 256 * 1024))
+
+
+def _tune_socket(sock):
+    """Raise socket buffers for throughput; RFCOMM support varies"""
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+    except Exception:
+        pass
+
+
+def _frame(message):
+    """Serialize a message with its 4-byte big-endian length prefix"""
+    message_data = _json_dumps(message)
+    return _LEN_PREFIX.pack(len(message_data)) + message_data
+
+
+# Constant responses framed once at import so the hot paths reduce to a
+# single sendall of precomputed bytes
+PONG_WIRE = _frame({'type': 'pong'})
+FILE_NOT_FOUND_WIRE = _frame({
+    'type': 'file_response',
+    'success': False,
+    'error': 'File not found'
+})
+
+
+class _ClientState:
+    """Per-connection receive state for the server event loop"""
+
+    def __init__(self, sock, info):
+        self.sock = sock
+        self.info = info
+        self.buffer = bytearray()
+
 class P2PBluetoothNetwork:
     def __init__(self):
         self.server_socket = None
+        self._selector = None
         self.is_running = False
-        self.service_uuid = "94f39d29-7d6d-437d-973b-fba39e49d4ee"
-        self.service_name = "P2P File Share"
-        self.connections = []
+        self.service_uuid = SERVICE_UUID
+        self.service_name = SERVICE_NAME
+        # Connected client sockets; a set for O(1) add/discard, with a
+        # lock since the accept loop and teardown touch it concurrently
+        self.connections = set()
+        self._conn_lock = threading.Lock()
         self.file_manager = FileManager()
+
+        # path -> (size, mtime, digest); client handlers run on several
+        # threads, so access goes through the lock
+        self._hash_cache = {}
+        self._hash_cache_lock = threading.Lock()
+
+        # Per-socket read-ahead buffers for _receive_exact
+        self._recv_buffers = {}
+
+        # peer address -> (port, resolved_at); SDP lookups are slow
+        # Bluetooth round-trips, so resolved ports are reused for a while
+        self._port_cache = {}
+
+        # (state_key, payload): the serialized file_list_response, reused
+        # until the shared files' stat fingerprints change
+        self._file_list_cache = None
+        self._file_list_lock = threading.Lock()
+
+        # peer address -> (socket, lock): one live outgoing RFCOMM
+        # connection per peer, reused across RPCs because connection
+        # setup takes seconds on Bluetooth
+        self._conn_pool = {}
+        self._conn_pool_lock = threading.Lock()
         
         # Callbacks
         self.on_peer_connected = None
@@ -61,13 +152,22 @@ class P2PBluetoothNetwork:
         """Stop the Bluetooth P2P server"""
         self.is_running = False
         
-        # Close all connections
-        for conn in self.connections.copy():
+        # Close all connections (snapshot under the lock, close outside it)
+        with self._conn_lock:
+            client_sockets = list(self.connections)
+            self.connections.clear()
+        for conn in client_sockets:
             try:
                 conn.close()
             except:
                 pass
-        self.connections.clear()
+
+        # Close pooled outgoing connections
+        with self._conn_pool_lock:
+            pooled = list(self._conn_pool.values())
+            self._conn_pool.clear()
+        for sock, _ in pooled:
+            self._close_client_socket(sock)
         
         # Close server socket
         if self.server_socket:
@@ -79,69 +179,106 @@ class P2PBluetoothNetwork:
             self.server_socket = None
     
     def _server_loop(self):
-        """Main server loop to accept Bluetooth connections"""
-        while self.is_running:
-            try:
-                client_socket, client_info = self.server_socket.accept()
-                self.connections.append(client_socket)
-                
-                # Handle client in separate thread
-                client_thread = threading.Thread(
-                    target=self._handle_client,
-                    args=(client_socket, client_info),
-                    daemon=True
-                )
-                client_thread.start()
-                
-                if self.on_peer_connected:
-                    self.on_peer_connected(client_info[0], str(client_info[1]))
-                    
-            except bluetooth.BluetoothError:
-                if self.is_running:
-                    self._log("Bluetooth server error")
-                break
-            except Exception as e:
-                if self.is_running:
-                    self._log(f"Server loop error: {e}")
-                break
-    
-    def _handle_client(self, client_socket, client_info):
-        """Handle individual Bluetooth client connection"""
+        """Single-threaded event loop serving all client connections"""
+        self._selector = selectors.DefaultSelector()
         try:
+            self.server_socket.setblocking(False)
+            self._selector.register(self.server_socket, selectors.EVENT_READ, None)
+
             while self.is_running:
-                # Receive message length first
-                length_data = self._receive_exact(client_socket, 4)
-                if not length_data:
-                    break
-                
-                message_length = int.from_bytes(length_data, 'big')
-                if message_length > 1024 * 1024:  # 1MB limit for messages
-                    break
-                
-                # Receive actual message
-                message_data = self._receive_exact(client_socket, message_length)
-                if not message_data:
-                    break
-                
-                try:
-                    message = json.loads(message_data.decode('utf-8'))
-                    self._process_message(client_socket, client_info, message)
-                except json.JSONDecodeError:
-                    self._log(f"Invalid JSON from {client_info[0]}")
-                    
-        except bluetooth.BluetoothError as e:
-            self._log(f"Bluetooth client handler error: {e}")
+                events = self._selector.select(timeout=1.0)
+                for key, _ in events:
+                    if key.data is None:
+                        self._accept_client()
+                    else:
+                        self._service_client(key.data)
         except Exception as e:
-            self._log(f"Client handler error: {e}")
+            if self.is_running:
+                self._log(f"Server loop error: {e}")
         finally:
+            self._selector.close()
+            self._selector = None
+
+    def _accept_client(self):
+        """Accept a new client connection and register it with the selector"""
+        try:
+            client_socket, client_info = self.server_socket.accept()
+        except (BlockingIOError, bluetooth.BluetoothError):
+            return
+
+        client_socket.setblocking(False)
+        _tune_socket(client_socket)
+        with self._conn_lock:
+            self.connections.add(client_socket)
+        self._selector.register(client_socket, selectors.EVENT_READ,
+                                _ClientState(client_socket, client_info))
+
+        if self.on_peer_connected:
+            self.on_peer_connected(client_info[0], str(client_info[1]))
+
+    def _service_client(self, state):
+        """Read available bytes from a client and dispatch parsed messages"""
+        try:
+            data = state.sock.recv(self.RECV_CHUNK)
+        except (BlockingIOError, InterruptedError):
+            return
+        except Exception:
+            data = b''
+
+        if not data:
+            self._drop_client(state)
+            return
+
+        state.buffer += data
+        while True:
+            if len(state.buffer) < 4:
+                return
+            message_length, = _LEN_PREFIX.unpack_from(state.buffer)
+            if message_length > 1024 * 1024:  # 1MB limit for messages
+                self._drop_client(state)
+                return
+            if len(state.buffer) < 4 + message_length:
+                return
+
+            message_data = bytes(state.buffer[4:4 + message_length])
+            del state.buffer[:4 + message_length]
+
             try:
-                client_socket.close()
-                if client_socket in self.connections:
-                    self.connections.remove(client_socket)
-                if self.on_peer_disconnected:
-                    self.on_peer_disconnected(client_info[0], str(client_info[1]))
-            except:
-                pass
+                message = _json_loads(message_data)
+            except ValueError:
+                # Covers json.JSONDecodeError and orjson.JSONDecodeError
+                self._log(f"Invalid JSON from {state.info[0]}")
+                continue
+
+            # Replies (including file payloads) are written blocking so
+            # _process_message can keep using plain sendall
+            state.sock.setblocking(True)
+            try:
+                self._process_message(state.sock, state.info, message)
+            except Exception as e:
+                self._log(f"Client handler error: {e}")
+                self._drop_client(state)
+                return
+            finally:
+                try:
+                    state.sock.setblocking(False)
+                except Exception:
+                    pass
+
+    def _drop_client(self, state):
+        """Unregister and close a client connection"""
+        try:
+            self._selector.unregister(state.sock)
+        except (KeyError, ValueError):
+            pass
+        try:
+            state.sock.close()
+        except:
+            pass
+        with self._conn_lock:
+            self.connections.discard(state.sock)
+        if self.on_peer_disconnected:
+            self.on_peer_disconnected(state.info[0], str(state.info[1]))
     
     def _process_message(self, client_socket, client_info, message):
         """Process received message"""
@@ -152,28 +289,42 @@ class P2PBluetoothNetwork:
         elif msg_type == 'file_request':
             self._handle_file_request(client_socket, message)
         elif msg_type == 'ping':
-            self._send_message(client_socket, {'type': 'pong'})
+            client_socket.sendall(PONG_WIRE)
         else:
             self._log(f"Unknown message type: {msg_type}")
     
     def _handle_file_list_request(self, client_socket):
         """Handle request for shared files list"""
-        files = []
+        try:
+            client_socket.sendall(self._file_list_payload())
+        except Exception as e:
+            self._log(f"Failed to send file list: {e}")
+
+    def _file_list_payload(self):
+        """On-wire file_list_response bytes, rebuilt only when files change"""
+        entries = []
         for filename in self.file_manager.get_shared_files():
             file_path = self.file_manager.get_file_path(filename)
-            if os.path.exists(file_path):
-                file_size = os.path.getsize(file_path)
-                files.append({
-                    'name': filename,
-                    'size': file_size,
-                    'hash': self._get_file_hash(file_path)
-                })
-        
-        response = {
-            'type': 'file_list_response',
-            'files': files
-        }
-        self._send_message(client_socket, response)
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                continue
+            entries.append((sys.intern(filename), file_path, st.st_size, st.st_mtime))
+
+        # Stat fingerprints stand in for the full response: if none of
+        # them moved, the cached serialization is still correct
+        state_key = tuple((name, size, mtime) for name, _, size, mtime in entries)
+        with self._file_list_lock:
+            if self._file_list_cache is not None and self._file_list_cache[0] == state_key:
+                return self._file_list_cache[1]
+
+        files = [{'name': name, 'size': size, 'hash': self._get_file_hash(path)}
+                 for name, path, size, _ in entries]
+        payload = _frame({'type': 'file_list_response', 'files': files})
+
+        with self._file_list_lock:
+            self._file_list_cache = (state_key, payload)
+        return payload
     
     def _handle_file_request(self, client_socket, message):
         """Handle file download request"""
@@ -182,13 +333,8 @@ class P2PBluetoothNetwork:
             return
         
         file_path = self.file_manager.get_file_path(filename)
-        if not os.path.exists(file_path):
-            error_response = {
-                'type': 'file_response',
-                'success': False,
-                'error': 'File not found'
-            }
-            self._send_message(client_socket, error_response)
+        if file_path is None or not os.path.exists(file_path):
+            client_socket.sendall(FILE_NOT_FOUND_WIRE)
             return
         
         # Send file info first
@@ -201,152 +347,325 @@ class P2PBluetoothNetwork:
         }
         self._send_message(client_socket, file_response)
         
-        # Send file data in chunks
+        # Send file data
         try:
             with open(file_path, 'rb') as file:
-                while True:
-                    chunk = file.read(4096)  # 4KB chunks for Bluetooth
-                    if not chunk:
-                        break
-                    client_socket.send(chunk)
+                if not self._try_sendfile(client_socket, file, file_size):
+                    self._send_file_buffered(client_socket, file)
         except Exception as e:
             self._log(f"Error sending file {filename}: {e}")
-    
-    def get_peer_files(self, peer_address):
-        """Get list of files from a Bluetooth peer"""
+
+    def _send_file_buffered(self, sock, file):
+        """Send file data double-buffered so disk reads overlap the send"""
+        free = queue.Queue()
+        filled = queue.Queue()
+        for _ in range(2):
+            free.put(bytearray(65536))
+
+        def read_ahead():
+            while True:
+                buf = free.get()
+                if buf is None:
+                    break
+                try:
+                    bytes_read = file.readinto(buf)
+                except ValueError:
+                    # File was closed after a send failure
+                    bytes_read = 0
+                filled.put((buf, bytes_read))
+                if not bytes_read:
+                    break
+
+        reader = threading.Thread(target=read_ahead, daemon=True)
+        reader.start()
         try:
-            client_socket = bluetooth.BluetoothSocket(bluetooth.RFCOMM)
-            client_socket.settimeout(15)
-            
-            # Find service port
-            services = bluetooth.find_service(uuid=self.service_uuid, address=peer_address)
-            if not services:
+            while True:
+                buf, bytes_read = filled.get()
+                if not bytes_read:
+                    break
+                sock.sendall(memoryview(buf)[:bytes_read])
+                free.put(buf)
+        finally:
+            # Unblock the reader if the send loop bailed out early
+            free.put(None)
+
+    def _try_sendfile(self, sock, file, file_size):
+        """Attempt a zero-copy os.sendfile transfer; False if unsupported"""
+        try:
+            sock_fd = sock.fileno()
+        except Exception:
+            return False
+
+        offset = 0
+        try:
+            while offset < file_size:
+                sent = os.sendfile(sock_fd, file.fileno(), offset, file_size - offset)
+                if sent == 0:
+                    break
+                offset += sent
+            return True
+        except (AttributeError, OSError):
+            if offset:
+                # Partway through a zero-copy transfer there is no clean
+                # fallback; let the caller report the failed send
+                raise
+            return False
+    
+    # Resolved SDP ports stay valid this long, in seconds
+    PORT_CACHE_TTL = 300
+
+    def _resolve_port(self, peer_address):
+        """Find our service port on a peer, with TTL-cached SDP results"""
+        cached = self._port_cache.get(peer_address)
+        if cached is not None and time.time() - cached[1] < self.PORT_CACHE_TTL:
+            return cached[0]
+
+        services = bluetooth.find_service(uuid=self.service_uuid, address=peer_address)
+        if not services:
+            return None
+
+        port = services[0]["port"]
+        self._port_cache[peer_address] = (port, time.time())
+        return port
+
+    def _connect_to_peer(self, peer_address, timeout):
+        """Connect a new socket to a peer, retrying once on a stale port"""
+        for attempt in (0, 1):
+            port = self._resolve_port(peer_address)
+            if port is None:
                 self._log(f"P2P service not found on {peer_address}")
                 return None
-            
-            port = services[0]["port"]
-            client_socket.connect((peer_address, port))
-            
-            # Request file list
-            request = {'type': 'file_list_request'}
-            if not self._send_message(client_socket, request):
+
+            client_socket = bluetooth.BluetoothSocket(bluetooth.RFCOMM)
+            client_socket.settimeout(timeout)
+            try:
+                client_socket.connect((peer_address, port))
+                _tune_socket(client_socket)
+                return client_socket
+            except bluetooth.BluetoothError:
+                self._close_client_socket(client_socket)
+                # The cached port may be stale; re-resolve and retry once
+                self._port_cache.pop(peer_address, None)
+                if attempt:
+                    raise
+        return None
+
+    def _get_peer_connection(self, peer_address, timeout):
+        """Return (socket, lock) for a pooled peer connection"""
+        with self._conn_pool_lock:
+            entry = self._conn_pool.get(peer_address)
+        if entry is not None:
+            return entry
+
+        client_socket = self._connect_to_peer(peer_address, timeout)
+        if client_socket is None:
+            return None
+
+        entry = (client_socket, threading.Lock())
+        with self._conn_pool_lock:
+            existing = self._conn_pool.get(peer_address)
+            if existing is not None:
+                # Another caller connected concurrently; keep theirs
+                entry = existing
+            else:
+                self._conn_pool[peer_address] = entry
+        if entry[0] is not client_socket:
+            self._close_client_socket(client_socket)
+        return entry
+
+    def _acquire_peer_connection(self, peer_address, timeout):
+        """Return a pooled (socket, lock) entry with the lock held.
+
+        The timeout is applied only after the per-connection lock is
+        acquired, so it cannot clobber the timeout of an in-flight
+        request on another thread. The caller must release the lock.
+        """
+        while True:
+            entry = self._get_peer_connection(peer_address, timeout)
+            if entry is None:
                 return None
-            
-            # Receive response
-            response = self._receive_message(client_socket)
-            client_socket.close()
-            
-            if response and response.get('type') == 'file_list_response':
-                return response.get('files', [])
-                
+            client_socket, conn_lock = entry
+
+            conn_lock.acquire()
+            # The previous holder may have evicted and closed this entry
+            # while we waited; re-check it is still the pooled one
+            with self._conn_pool_lock:
+                current = self._conn_pool.get(peer_address)
+            if current is not entry:
+                conn_lock.release()
+                continue
+
+            try:
+                client_socket.settimeout(timeout)
+            except Exception:
+                conn_lock.release()
+                self._evict_peer_connection(peer_address, client_socket)
+                continue
+            return entry
+
+    def _evict_peer_connection(self, peer_address, sock):
+        """Drop a pooled connection that failed or fell out of sync"""
+        if sock is None:
+            return
+        with self._conn_pool_lock:
+            entry = self._conn_pool.get(peer_address)
+            if entry is not None and entry[0] is sock:
+                del self._conn_pool[peer_address]
+        self._close_client_socket(sock)
+
+    def get_peer_files(self, peer_address):
+        """Get list of files from a Bluetooth peer"""
+        try:
+            entry = self._acquire_peer_connection(peer_address, 15)
         except bluetooth.BluetoothError as e:
             self._log(f"Bluetooth error getting files from {peer_address}: {e}")
+            return None
         except Exception as e:
             self._log(f"Failed to get files from {peer_address}: {e}")
-        
-        return None
+            return None
+        if entry is None:
+            return None
+        client_socket, conn_lock = entry
+
+        # Evictions happen before the lock is released, so a thread
+        # waiting in _acquire_peer_connection can never adopt a socket
+        # that is about to be closed or left mid-stream
+        try:
+            try:
+                # Request file list
+                if not self._send_message(client_socket, {'type': 'file_list_request'}):
+                    self._evict_peer_connection(peer_address, client_socket)
+                    return None
+
+                # Receive response
+                response = self._receive_message(client_socket)
+            except bluetooth.BluetoothError as e:
+                self._log(f"Bluetooth error getting files from {peer_address}: {e}")
+                self._evict_peer_connection(peer_address, client_socket)
+                return None
+            except Exception as e:
+                self._log(f"Failed to get files from {peer_address}: {e}")
+                self._evict_peer_connection(peer_address, client_socket)
+                return None
+
+            if response and response.get('type') == 'file_list_response':
+                return response.get('files', [])
+            self._evict_peer_connection(peer_address, client_socket)
+            return None
+        finally:
+            conn_lock.release()
     
     def request_file(self, peer_address, filename, save_path):
         """Request and download a file from a Bluetooth peer"""
         try:
-            client_socket = bluetooth.BluetoothSocket(bluetooth.RFCOMM)
-            client_socket.settimeout(60)
-            
-            # Find service port
-            services = bluetooth.find_service(uuid=self.service_uuid, address=peer_address)
-            if not services:
-                self._log(f"P2P service not found on {peer_address}")
-                return False
-            
-            port = services[0]["port"]
-            client_socket.connect((peer_address, port))
-            
-            # Request file
-            request = {
-                'type': 'file_request',
-                'filename': filename
-            }
-            if not self._send_message(client_socket, request):
-                client_socket.close()
-                return False
-            
-            # Receive response
-            response = self._receive_message(client_socket)
-            if not response or not response.get('success'):
-                error = response.get('error', 'Unknown error') if response else 'No response'
-                self._log(f"File request failed: {error}")
-                client_socket.close()
-                return False
-            
-            file_size = response.get('size', 0)
-            
-            # Receive file data
-            with open(save_path, 'wb') as file:
-                bytes_received = 0
-                while bytes_received < file_size:
-                    remaining = min(4096, file_size - bytes_received)
-                    chunk = client_socket.recv(remaining)
-                    if not chunk:
-                        break
-                    file.write(chunk)
-                    bytes_received += len(chunk)
-            
-            client_socket.close()
-            
-            if bytes_received == file_size:
-                if self.on_file_received:
-                    self.on_file_received(filename, peer_address)
-                return True
-            else:
-                self._log(f"Incomplete file transfer: {bytes_received}/{file_size}")
-                return False
-                    
+            entry = self._acquire_peer_connection(peer_address, 60)
         except bluetooth.BluetoothError as e:
             self._log(f"Bluetooth error downloading {filename}: {e}")
+            return False
         except Exception as e:
             self._log(f"Failed to download {filename} from {peer_address}: {e}")
-        
-        return False
+            return False
+        if entry is None:
+            return False
+        client_socket, conn_lock = entry
+
+        try:
+            try:
+                # Request file
+                request = {
+                    'type': 'file_request',
+                    'filename': filename
+                }
+                if not self._send_message(client_socket, request):
+                    self._evict_peer_connection(peer_address, client_socket)
+                    return False
+
+                # Receive response
+                response = self._receive_message(client_socket)
+                if not response or not response.get('success'):
+                    error = response.get('error', 'Unknown error') if response else 'No response'
+                    self._log(f"File request failed: {error}")
+                    if not response:
+                        self._evict_peer_connection(peer_address, client_socket)
+                    return False
+
+                file_size = response.get('size', 0)
+
+                # The read-ahead buffer may already hold the first file bytes
+                leftover = self._drain_recv_buffer(client_socket)
+
+                # Receive file data
+                with open(save_path, 'wb') as file:
+                    bytes_received = 0
+                    if leftover:
+                        file.write(leftover[:file_size])
+                        bytes_received = min(len(leftover), file_size)
+                    while bytes_received < file_size:
+                        remaining = min(65536, file_size - bytes_received)
+                        chunk = client_socket.recv(remaining)
+                        if not chunk:
+                            break
+                        file.write(chunk)
+                        bytes_received += len(chunk)
+
+                if bytes_received != file_size:
+                    self._log(f"Incomplete file transfer: {bytes_received}/{file_size}")
+                    # The stream is mid-file, so the connection is
+                    # unusable; evict while still holding the lock so no
+                    # other thread inherits the half-read stream
+                    self._evict_peer_connection(peer_address, client_socket)
+                    return False
+            except bluetooth.BluetoothError as e:
+                self._log(f"Bluetooth error downloading {filename}: {e}")
+                self._evict_peer_connection(peer_address, client_socket)
+                return False
+            except Exception as e:
+                self._log(f"Failed to download {filename} from {peer_address}: {e}")
+                self._evict_peer_connection(peer_address, client_socket)
+                return False
+        finally:
+            conn_lock.release()
+
+        if self.on_file_received:
+            self.on_file_received(filename, peer_address)
+        return True
     
     def ping_peer(self, peer_address):
         """Ping a Bluetooth peer to check if it's alive"""
         try:
-            client_socket = bluetooth.BluetoothSocket(bluetooth.RFCOMM)
-            client_socket.settimeout(5)
-            
-            # Find service port
-            services = bluetooth.find_service(uuid=self.service_uuid, address=peer_address)
-            if not services:
-                return False
-            
-            port = services[0]["port"]
-            client_socket.connect((peer_address, port))
-            
-            # Send ping
-            ping_msg = {'type': 'ping'}
-            if not self._send_message(client_socket, ping_msg):
-                client_socket.close()
-                return False
-            
-            # Wait for pong
-            response = self._receive_message(client_socket)
-            client_socket.close()
-            
-            return response and response.get('type') == 'pong'
-                
+            entry = self._acquire_peer_connection(peer_address, 5)
         except:
             return False
+        if entry is None:
+            return False
+        client_socket, conn_lock = entry
+
+        try:
+            try:
+                # Send ping
+                if not self._send_message(client_socket, {'type': 'ping'}):
+                    self._evict_peer_connection(peer_address, client_socket)
+                    return False
+
+                # Wait for pong
+                response = self._receive_message(client_socket)
+            except:
+                self._evict_peer_connection(peer_address, client_socket)
+                return False
+
+            if response and response.get('type') == 'pong':
+                return True
+            self._evict_peer_connection(peer_address, client_socket)
+            return False
+        finally:
+            conn_lock.release()
     
     def _send_message(self, sock, message):
         """Send JSON message with length prefix"""
         try:
-            message_data = json.dumps(message).encode('utf-8')
-            message_length = len(message_data)
-            
-            # Send length first (4 bytes, big endian)
-            sock.send(message_length.to_bytes(4, 'big'))
-            # Send message
-            sock.send(message_data)
+            # One sendall for prefix+body: half the syscalls, and unlike
+            # plain send it cannot short-write
+            sock.sendall(_frame(message))
             return True
         except Exception as e:
             self._log(f"Failed to send message: {e}")
@@ -359,8 +678,8 @@ class P2PBluetoothNetwork:
             length_data = self._receive_exact(sock, 4)
             if not length_data:
                 return None
-            
-            message_length = int.from_bytes(length_data, 'big')
+
+            message_length, = _LEN_PREFIX.unpack(length_data)
             if message_length > 1024 * 1024:  # 1MB limit
                 return None
             
@@ -369,29 +688,90 @@ class P2PBluetoothNetwork:
             if not message_data:
                 return None
             
-            return json.loads(message_data.decode('utf-8'))
+            return _json_loads(message_data)
         except Exception as e:
             self._log(f"Failed to receive message: {e}")
             return None
     
+    # Read-ahead size: big enough that a length prefix and its body
+    # usually arrive in a single syscall
+    RECV_CHUNK = 65536
+
     def _receive_exact(self, sock, num_bytes):
-        """Receive exact number of bytes"""
-        data = b''
-        while len(data) < num_bytes:
-            chunk = sock.recv(num_bytes - len(data))
-            if not chunk:
-                return None
-            data += chunk
+        """Receive exact number of bytes via a per-socket read-ahead buffer"""
+        pending = self._recv_buffers.get(sock)
+        if pending is None:
+            pending = self._recv_buffers[sock] = bytearray()
+
+        recv_into = getattr(sock, 'recv_into', None)
+        if recv_into is not None:
+            scratch = bytearray(self.RECV_CHUNK)
+            view = memoryview(scratch)
+
+        while len(pending) < num_bytes:
+            if recv_into is not None:
+                received = recv_into(scratch)
+                if not received:
+                    return None
+                pending += view[:received]
+            else:
+                chunk = sock.recv(self.RECV_CHUNK)
+                if not chunk:
+                    return None
+                pending += chunk
+
+        data = bytes(pending[:num_bytes])
+        del pending[:num_bytes]
         return data
+
+    def _drain_recv_buffer(self, sock):
+        """Take and forget any read-ahead bytes buffered for a socket"""
+        pending = self._recv_buffers.pop(sock, None)
+        return bytes(pending) if pending else b''
+
+    def _close_client_socket(self, sock):
+        """Close an outgoing socket and drop its read-ahead buffer"""
+        self._recv_buffers.pop(sock, None)
+        try:
+            sock.close()
+        except:
+            pass
     
     def _get_file_hash(self, file_path):
-        """Get SHA-256 hash of a file"""
+        """Get SHA-256 hash of a file, cached by size and mtime"""
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return ""
+
+        fingerprint = (st.st_size, st.st_mtime)
+        with self._hash_cache_lock:
+            cached = self._hash_cache.get(file_path)
+            if cached is not None and cached[:2] == fingerprint:
+                return cached[2]
+
+        file_hash = self._compute_file_hash(file_path)
+        if file_hash:
+            # Interned so every response reuses the same str object
+            # instead of re-allocating 64 hex characters per request
+            file_hash = sys.intern(file_hash)
+            with self._hash_cache_lock:
+                self._hash_cache[file_path] = fingerprint + (file_hash,)
+        return file_hash
+
+    def _compute_file_hash(self, file_path):
+        """Compute SHA-256 hash of a file"""
         try:
-            hash_sha256 = hashlib.sha256()
             with open(file_path, 'rb') as f:
-                for chunk in iter(lambda: f.read(4096), b""):
+                if hasattr(hashlib, 'file_digest'):
+                    # Python 3.11+: read+hash loop runs in C and releases
+                    # the GIL, so other client threads keep running
+                    return hashlib.file_digest(f, 'sha256').hexdigest()
+
+                hash_sha256 = hashlib.sha256()
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
                     hash_sha256.update(chunk)
-            return hash_sha256.hexdigest()
+                return hash_sha256.hexdigest()
         except:
             return ""
     
@@ -7,7 +7,8 @@ Handles Bluetooth device discovery and service detection using pybluez.
 import bluetooth
 import threading
 import time
-from collections import defaultdict
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 class BluetoothPeerDiscovery:
     def __init__(self):
@@ -15,7 +16,9 @@ class BluetoothPeerDiscovery:
         self.service_uuid = "94f39d29-7d6d-437d-973b-fba39e49d4ee"
         self.service_name = "P2P File Share"
         self.peers = {}  # {address -> peer_info}
-        self.last_seen = defaultdict(float)
+        # {address -> last_seen}, kept ordered oldest-first so expiry
+        # scans touch only the entries that actually expired
+        self.last_seen = OrderedDict()
         
         # Callbacks
         self.on_peer_found = None
@@ -24,6 +27,15 @@ class BluetoothPeerDiscovery:
         # Threading
         self.discovery_thread = None
         self.cleanup_thread = None
+        # Wakes the cleanup thread when the expiry schedule changes
+        self._cleanup_cv = threading.Condition()
+        # Bounded pool for SDP service checks; the Bluetooth stack is the
+        # serializing resource, so more threads only add contention
+        self._service_pool = None
+
+        # (fetched_at, info): the local adapter rarely changes, so cache
+        # lookups briefly for the UI status refresh
+        self._local_info_cache = None
     
     def start_discovery(self):
         """Start Bluetooth peer discovery service"""
@@ -31,7 +43,8 @@ class BluetoothPeerDiscovery:
             return
         
         self.is_running = True
-        
+        self._service_pool = ThreadPoolExecutor(max_workers=8)
+
         # Start discovery thread
         self.discovery_thread = threading.Thread(target=self._discovery_loop, daemon=True)
         self.discovery_thread.start()
@@ -43,6 +56,12 @@ class BluetoothPeerDiscovery:
     def stop_discovery(self):
         """Stop Bluetooth peer discovery service"""
         self.is_running = False
+        if self._service_pool is not None:
+            self._service_pool.shutdown(wait=False)
+            self._service_pool = None
+        # Drop the cleanup thread out of its wait immediately
+        with self._cleanup_cv:
+            self._cleanup_cv.notify_all()
     
     def discover_peers(self):
         """Actively discover Bluetooth peers"""
@@ -56,12 +75,20 @@ class BluetoothPeerDiscovery:
         """Get list of discovered Bluetooth peers"""
         current_time = time.time()
         active_peers = []
-        
-        for address, peer_info in self.peers.items():
-            # Return peers seen in last 120 seconds (Bluetooth discovery is slower)
-            if current_time - self.last_seen[address] < 120:
-                active_peers.append(peer_info)
-        
+
+        # last_seen is ordered oldest-first, so walk from the newest end
+        # and stop at the first peer outside the 120-second window
+        # (Bluetooth discovery is slower than WiFi). Hold the lock: the
+        # service-pool threads re-insert entries, which would break an
+        # unguarded iteration mid-walk
+        with self._cleanup_cv:
+            for address in reversed(self.last_seen):
+                if current_time - self.last_seen[address] >= 120:
+                    break
+                peer_info = self.peers.get(address)
+                if peer_info is not None:
+                    active_peers.append(peer_info)
+
         return active_peers
     
     def is_peer_alive(self, peer_address):
@@ -93,16 +120,17 @@ class BluetoothPeerDiscovery:
                 flush_cache=True
             )
             
+            pool = self._service_pool
             for address, name in nearby_devices:
-                if not self.is_running:
+                if not self.is_running or pool is None:
                     break
-                
+
                 # Check if device has our P2P service
-                threading.Thread(
-                    target=self._check_peer_service,
-                    args=(address, name),
-                    daemon=True
-                ).start()
+                try:
+                    pool.submit(self._check_peer_service, address, name)
+                except RuntimeError:
+                    # Pool shut down while we were iterating
+                    break
                 
         except bluetooth.BluetoothError as e:
             print(f"Bluetooth discovery error: {e}")
@@ -129,26 +157,37 @@ class BluetoothPeerDiscovery:
             print(f"Service check error for {address}: {e}")
     
     def _cleanup_loop(self):
-        """Periodically clean up old peers"""
+        """Expire old peers, sleeping until the next known expiry"""
         while self.is_running:
             try:
                 current_time = time.time()
-                peers_to_remove = []
-                
-                for address, last_seen_time in list(self.last_seen.items()):
-                    if current_time - last_seen_time > 180:  # 3 minutes timeout for Bluetooth
-                        peers_to_remove.append(address)
-                
-                for address in peers_to_remove:
-                    if address in self.peers:
-                        peer_info = self.peers[address]
-                        del self.peers[address]
-                        del self.last_seen[address]
-                        
-                        if self.on_peer_lost:
-                            self.on_peer_lost(peer_info)
-                
-                time.sleep(20)  # Check every 20 seconds
+                expired = []
+
+                # Oldest entries sit at the front, so pop until the first
+                # one still inside the 3-minute Bluetooth timeout
+                with self._cleanup_cv:
+                    while self.last_seen:
+                        address, last_seen_time = next(iter(self.last_seen.items()))
+                        if current_time - last_seen_time <= 180:
+                            break
+                        self.last_seen.popitem(last=False)
+                        peer_info = self.peers.pop(address, None)
+                        if peer_info is not None:
+                            expired.append(peer_info)
+
+                for peer_info in expired:
+                    if self.on_peer_lost:
+                        self.on_peer_lost(peer_info)
+
+                # Sleep exactly until the oldest remaining peer would
+                # expire; with no peers, wait for _add_peer to notify
+                with self._cleanup_cv:
+                    if self.last_seen:
+                        oldest = next(iter(self.last_seen.values()))
+                        timeout = max(oldest + 180 - time.time(), 0.1)
+                    else:
+                        timeout = None
+                    self._cleanup_cv.wait(timeout=timeout)
             except Exception:
                 break
     
@@ -167,31 +206,44 @@ class BluetoothPeerDiscovery:
         }
         
         self.peers[address] = peer_info
-        self.last_seen[address] = current_time
+        # Re-insert so the entry moves to the newest end of the ordering
+        with self._cleanup_cv:
+            was_empty = not self.last_seen
+            self.last_seen.pop(address, None)
+            self.last_seen[address] = current_time
+            if was_empty:
+                # The cleanup thread is in an untimed wait; give it a
+                # deadline for this first peer
+                self._cleanup_cv.notify_all()
         
         if is_new_peer and self.on_peer_found:
             self.on_peer_found(peer_info)
     
+    # How long cached local adapter info stays valid, in seconds
+    LOCAL_INFO_TTL = 30
+
     def get_local_bluetooth_info(self):
         """Get local Bluetooth adapter information"""
+        cached = self._local_info_cache
+        if cached is not None and time.time() - cached[0] < self.LOCAL_INFO_TTL:
+            return cached[1]
+
         try:
             local_address = bluetooth.read_local_bdaddr()[0]
-            
+
             # Try to get adapter name
             try:
-                import socket
-                sock = bluetooth.BluetoothSocket(bluetooth.L2CAP)
-                sock.bind((local_address, 0))
                 adapter_name = bluetooth.lookup_name(local_address, timeout=5)
-                sock.close()
             except:
                 adapter_name = "Unknown"
-            
-            return {
+
+            info = {
                 'address': local_address,
                 'name': adapter_name,
                 'is_discoverable': self._is_discoverable()
             }
+            self._local_info_cache = (time.time(), info)
+            return info
         except Exception as e:
             print(f"Error getting Bluetooth info: {e}")
             return None
@@ -235,31 +287,45 @@ class BluetoothPeerDiscovery:
     
     def refresh_peer_services(self):
         """Refresh service information for known peers"""
-        def refresh_thread():
-            for address in list(self.peers.keys()):
-                if not self.is_running:
-                    break
-                
-                try:
-                    services = bluetooth.find_service(
-                        uuid=self.service_uuid,
-                        address=address
-                    )
-                    
-                    if services:
-                        # Update last seen time
-                        self.last_seen[address] = time.time()
-                    else:
-                        # Service no longer available
-                        if address in self.peers:
-                            peer_info = self.peers[address]
-                            del self.peers[address]
-                            del self.last_seen[address]
-                            
-                            if self.on_peer_lost:
-                                self.on_peer_lost(peer_info)
-                                
-                except Exception:
-                    continue
-        
-        threading.Thread(target=refresh_thread, daemon=True).start()
\ No newline at end of file
+        pool = self._service_pool
+        if pool is None:
+            return
+
+        for address in list(self.peers.keys()):
+            try:
+                pool.submit(self._refresh_peer_service, address)
+            except RuntimeError:
+                break
+
+    def _refresh_peer_service(self, address):
+        """Re-check whether a known peer still advertises our service"""
+        if not self.is_running:
+            return
+
+        try:
+            services = bluetooth.find_service(
+                uuid=self.service_uuid,
+                address=address
+            )
+        except Exception:
+            return
+
+        if services:
+            # Update last seen time, moving the entry to the newest end
+            with self._cleanup_cv:
+                was_empty = not self.last_seen
+                self.last_seen.pop(address, None)
+                self.last_seen[address] = time.time()
+                if was_empty:
+                    # The cleanup thread is in an untimed wait; give it a
+                    # deadline for this entry
+                    self._cleanup_cv.notify_all()
+        else:
+            # Service no longer available; callback fires outside the
+            # lock like in _cleanup_loop
+            with self._cleanup_cv:
+                peer_info = self.peers.pop(address, None)
+                self.last_seen.pop(address, None)
+
+            if peer_info is not None and self.on_peer_lost:
+                self.on_peer_lost(peer_info)
\ No newline at end of file